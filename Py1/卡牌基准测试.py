@@ -0,0 +1,360 @@
+"""卡牌管理系统基准测试
+
+用固定随机种子生成覆盖全部13种属性、多种稀有度的卡牌，在 10^3 ~ 10^6 规模下测量
+导入、按名称查找、导出(覆盖/更新)、单场对战和混战的耗时、吞吐量和内存峰值，
+每项预热后重复测量，按最快一次计算吞吐量；结果写入 JSON，可与之前的结果比较并标出性能退化。
+
+    python 卡牌基准测试.py --sizes 1000,10000 --output bench.json
+    python 卡牌基准测试.py --compare bench.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 主程序文件名不是合法的模块名，按路径加载
+_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "卡牌管理系统0.2.py")
+_spec = importlib.util.spec_from_file_location("卡牌管理系统", _MODULE_PATH)
+cards_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cards_module)
+
+Card = cards_module.Card
+CardManager = cards_module.CardManager
+
+ELEMENTS = list(CardManager().element_relations)
+RARITIES = ['N', 'R', 'SR', 'SSR', 'UR']
+RARITY_WEIGHTS = [50, 25, 15, 7, 3]
+NAME_CHARS = "火水木电冰土岩虫兽龙神秘光明暗王者之剑影凤凰星月风云雷霆"
+
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+LOOKUPS = 200            # 每个规模下按名称查找的次数，一半命中一半未命中
+BATTLES = 2000           # 单场对战的次数
+MAX_ROYALE_CARDS = 1000  # 混战为 n(n-1)/2 场对战，参战卡牌数超过该值的规模直接跳过
+REPEAT = 5               # 预热一次后至少重复测量的次数
+MIN_TIME = 1.0           # 重复测量的总耗时不足该秒数时继续测量
+MAX_REPEAT = 100
+TRACEMALLOC_SLOWDOWN = 8  # 开启 tracemalloc 后运行变慢的大致倍数，用于预估内存测量的耗时
+
+
+class SkipBenchmark(Exception):
+    """准备函数判断该规模不适合测量时抛出，结果中记为跳过"""
+
+
+def generate_cards(count, seed=0):
+    """生成 count 张名称唯一的卡牌，属性、稀有度和数值由 seed 决定"""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        prefix = ''.join(rng.choice(NAME_CHARS) for _ in range(rng.randint(1, 3)))
+        cards.append(Card(
+            f"{prefix}{i}",
+            rng.randint(50, 500),
+            rng.randint(5, 80),
+            rng.randint(0, 50),
+            ELEMENTS[i % len(ELEMENTS)] if i < len(ELEMENTS) else rng.choice(ELEMENTS),
+            rng.choices(RARITIES, weights=RARITY_WEIGHTS)[0],
+        ))
+    return cards
+
+
+def write_cards_file(file_path, cards):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        for card in cards:
+            file.write(f"{card.name},{card.hp},{card.attack},{card.defense},{card.element},{card.rarity}\n")
+
+
+def manager_with(cards):
+    manager = CardManager()
+    manager.cards = list(cards)
+    return manager
+
+
+# 每个基准测试: (准备函数, 复杂度指数)
+# 准备函数返回 (被测函数, 操作数)，准备过程不计时，每次测量前都重新准备；
+# 复杂度指数用于预估更大规模的耗时
+def bench_import(cards, work_dir, seed):
+    file_path = os.path.join(work_dir, "import.txt")
+    write_cards_file(file_path, cards)
+    manager = CardManager()
+    return lambda: manager.import_cards(file_path), len(cards)
+
+
+def bench_find(cards, work_dir, seed):
+    manager = manager_with(cards)
+    rng = random.Random(seed)
+    names = [rng.choice(cards).name for _ in range(LOOKUPS // 2)]
+    names += [f"不存在的卡牌{i}" for i in range(LOOKUPS - len(names))]
+
+    def run():
+        for name in names:
+            manager.find_card_by_name(name)
+    return run, len(names)
+
+
+def bench_export_overwrite(cards, work_dir, seed):
+    manager = manager_with(cards)
+    file_path = os.path.join(work_dir, "export.txt")
+    write_cards_file(file_path, cards[:1])
+    return lambda: manager.export_cards(file_path, 'y'), len(cards)
+
+
+def bench_export_update(cards, work_dir, seed):
+    manager = manager_with(cards)
+    file_path = os.path.join(work_dir, "export_update.txt")
+    # 文件中已有一半卡牌，更新模式需要改写这一半并追加另一半
+    write_cards_file(file_path, cards[::2])
+    return lambda: manager.export_cards(file_path, 'u'), len(cards)
+
+
+def bench_simulate_battle(cards, work_dir, seed):
+    manager = manager_with(cards)
+    rng = random.Random(seed)
+    pairs = [(rng.choice(cards), rng.choice(cards)) for _ in range(BATTLES)]
+
+    def run():
+        # 与菜单中的模拟对战相同，逐回合输出文字
+        for card1, card2 in pairs:
+            manager.run_battle(card1, card2, [cards_module.TextBattleSink(metrics=manager.metrics)])
+    return run, len(pairs)
+
+
+def bench_headless_battle(cards, work_dir, seed):
+    manager = manager_with(cards)
+    rng = random.Random(seed)
+    pairs = [(rng.choice(cards), rng.choice(cards)) for _ in range(BATTLES)]
+
+    def run():
+        for card1, card2 in pairs:
+            manager.run_battle(card1, card2)
+    return run, len(pairs)
+
+
+def bench_battle_royale(cards, work_dir, seed):
+    royale_cards = [card for card in cards if card.rarity == RARITIES[0]]
+    count = len(royale_cards)
+    if count > MAX_ROYALE_CARDS:
+        raise SkipBenchmark(f"参战卡牌 {count} 张，超过上限 {MAX_ROYALE_CARDS}")
+    manager = manager_with(royale_cards)
+    return lambda: manager.battle_royale(RARITIES[0]), count * (count - 1) // 2
+
+
+BENCHMARKS = {
+    # 导入时每行都会线性查找同名卡牌，整体为 O(n^2)
+    'import_cards': (bench_import, 2),
+    'find_card_by_name': (bench_find, 1),
+    'export_cards_overwrite': (bench_export_overwrite, 1),
+    'export_cards_update': (bench_export_update, 1),
+    'simulate_battle': (bench_simulate_battle, 0),
+    'headless_battle': (bench_headless_battle, 0),
+    # 同稀有度的卡牌两两对战，参战卡牌数超过上限时跳过
+    'battle_royale': (bench_battle_royale, 2),
+}
+
+
+def measure(setup, cards, work_dir, seed, memory=True, repeat=REPEAT, min_time=MIN_TIME, budget=None):
+    """返回 {'times': [每次耗时秒数], 'ops', 'setup_seconds', 'peak_kib', 'memory_seconds'}
+
+    先预热一次，再至少测量 repeat 次，总耗时不足 min_time 秒时继续测量(最多 MAX_REPEAT 次)。
+    内存峰值在另一次单独运行中用 tracemalloc 测量，memory_seconds 为这次运行(含准备)的耗时。
+    给出 budget 时，至少测量一次；再测一次(或内存测量)会超出预算时提前结束，未测内存时 peak_kib 为 None。
+    """
+    begin = time.perf_counter()
+
+    def over_budget(extra):
+        return budget is not None and time.perf_counter() - begin + extra > budget
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        run, ops = setup(cards, work_dir, seed)
+        setup_seconds = time.perf_counter() - begin
+        run()
+
+        times = []
+        while len(times) < MAX_REPEAT and (len(times) < repeat or sum(times) < min_time):
+            if times and over_budget(setup_seconds + min(times)):
+                break
+            run, ops = setup(cards, work_dir, seed)
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+        peak_kib = None
+        memory_seconds = 0.0
+        if memory and not over_budget(setup_seconds + min(times) * TRACEMALLOC_SLOWDOWN):
+            start = time.perf_counter()
+            run, _ = setup(cards, work_dir, seed)
+            tracemalloc.start()
+            try:
+                run()
+                peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+            memory_seconds = time.perf_counter() - start
+    return {
+        'times': times,
+        'ops': ops,
+        'setup_seconds': setup_seconds,
+        'peak_kib': peak_kib,
+        'memory_seconds': memory_seconds,
+    }
+
+
+def estimate_seconds(last_size, stats, size, exponent, repeat=REPEAT, min_time=MIN_TIME, memory=True):
+    """按上一个规模的测量结果推算 measure 在 size 规模下的总耗时
+
+    准备(按线性)、预热、repeat 次和为凑够 min_time 追加的测量、内存测量都计入。
+    """
+    scale = (size / last_size) ** exponent
+    run = min(stats['times']) * scale
+    setup = stats['setup_seconds'] * size / last_size
+    runs = min(MAX_REPEAT, max(repeat, math.ceil(min_time / run) if run > 0 else MAX_REPEAT))
+    total = (runs + 1) * (setup + run)
+    if memory:
+        # 上一个规模未做内存测量时按 tracemalloc 的大致减速倍数推算
+        if stats['peak_kib'] is not None:
+            total += stats['memory_seconds'] * max(scale, size / last_size)
+        else:
+            total += setup + run * TRACEMALLOC_SLOWDOWN
+    return total
+
+
+def run_benchmarks(sizes, names, seed=0, budget=60.0, memory=True, repeat=REPEAT, min_time=MIN_TIME):
+    """ops_per_sec 按多次测量中最快的一次计算，受偶发抖动的影响最小"""
+    results = []
+    last = {}  # 基准测试名 -> (上一个测量过的规模, measure 的结果)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            cards = None  # 每个规模只生成一次，各项基准测试共用
+            for name in names:
+                setup, exponent = BENCHMARKS[name]
+                result = {'name': name, 'size': size}
+                # 按复杂度从上一个规模推算总耗时，超出预算的规模直接跳过
+                if name in last and estimate_seconds(*last[name], size, exponent, repeat, min_time, memory) > budget:
+                    result['skipped'] = f"预计耗时超过 {budget:g} 秒"
+                    print(f"{name:<24} n={size:<9} 跳过 ({result['skipped']})")
+                    results.append(result)
+                    continue
+
+                if cards is None:
+                    cards = generate_cards(size, seed)
+                start = time.perf_counter()
+                try:
+                    stats = measure(setup, cards, work_dir, seed, memory, repeat, min_time, budget)
+                except SkipBenchmark as e:
+                    result['skipped'] = str(e)
+                    print(f"{name:<24} n={size:<9} 跳过 ({result['skipped']})")
+                    results.append(result)
+                    continue
+                times, ops, peak_kib = stats['times'], stats['ops'], stats['peak_kib']
+                seconds = min(times)
+                result.update({
+                    'seconds': seconds,
+                    'median_seconds': statistics.median(times),
+                    'runs': len(times),
+                    'wall_seconds': time.perf_counter() - start,
+                    'ops': ops,
+                    'ops_per_sec': ops / seconds if seconds else None,
+                    'peak_kib': peak_kib,
+                })
+                results.append(result)
+                last[name] = (size, stats)
+                memory_text = f"{peak_kib:>12.1f} KiB" if peak_kib is not None else ""
+                print(f"{name:<24} n={size:<9} {seconds:>10.4f} s {result['ops_per_sec'] or 0:>14.1f} ops/s "
+                      f"x{len(times):<3} {memory_text}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """返回吞吐量比基线下降超过 threshold(比例) 的条目"""
+    previous = {(item['name'], item['size']): item for item in baseline['results']}
+    regressions = []
+    for item in results:
+        old = previous.get((item['name'], item['size']))
+        if not old or not old.get('ops_per_sec') or not item.get('ops_per_sec'):
+            continue
+        change = item['ops_per_sec'] / old['ops_per_sec'] - 1
+        if change < -threshold:
+            regressions.append({
+                'name': item['name'],
+                'size': item['size'],
+                'baseline_ops_per_sec': old['ops_per_sec'],
+                'ops_per_sec': item['ops_per_sec'],
+                'change': change,
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="卡牌管理系统基准测试")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="卡牌数量，逗号分隔")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help="要运行的基准测试，逗号分隔")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=60.0,
+                        help="单项预计总耗时(含预热、重复和内存测量)超过该秒数时跳过")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="预热后至少重复测量的次数")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help="重复测量的总耗时不足该秒数时继续测量")
+    parser.add_argument('--no-memory', action='store_true', help="不测量内存峰值")
+    parser.add_argument('--output', default="bench_result.json")
+    parser.add_argument('--compare', help="作为基线的历史结果 JSON")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="吞吐量下降超过该比例时视为退化")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    names = args.benchmarks.split(',')
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准测试: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    results = run_benchmarks(sizes, names, args.seed, args.budget, not args.no_memory,
+                             args.repeat, args.min_time)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'min_time': args.min_time,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+    exit_code = 0
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        report['regressions'] = regressions
+        if regressions:
+            exit_code = 1
+            print(f"\n发现 {len(regressions)} 项性能退化:")
+            for item in regressions:
+                print(f"- {item['name']} n={item['size']}: "
+                      f"{item['baseline_ops_per_sec']:.1f} -> {item['ops_per_sec']:.1f} ops/s ({item['change']:+.1%})")
+        else:
+            print("\n未发现性能退化")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
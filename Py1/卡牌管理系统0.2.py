@@ -1,4 +1,26 @@
+import bisect
+import cProfile
+import functools
+import gc
+import heapq
+import itertools
+import json
+import math
 import os
+import pstats
+import random
+import struct
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅用于加速属性对战分析
+    np = None
 
 
 class Card:
@@ -21,9 +43,579 @@ class Card:
                 f"赋分: {self.score}")
 
 
+class CardMetrics:
+    """操作计数、累计耗时和耗时直方图
+
+    关闭时(默认)被 instrumented 包装的方法只多一次属性判断，几乎没有开销。
+    """
+
+    # 直方图上界(秒)，与 Prometheus histogram 的 le 标签对应
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.server = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+            self.totals = {}
+            self.histograms = {}
+
+    def observe(self, op, seconds):
+        bucket = bisect.bisect_left(self.BUCKETS, seconds)
+        with self.lock:
+            self.counts[op] = self.counts.get(op, 0) + 1
+            self.totals[op] = self.totals.get(op, 0.0) + seconds
+            histogram = self.histograms.get(op)
+            if histogram is None:
+                histogram = self.histograms[op] = [0] * len(self.BUCKETS)
+            histogram[bucket] += 1
+
+    def to_dict(self):
+        with self.lock:
+            result = {}
+            for op in sorted(self.counts):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.BUCKETS, self.histograms[op]):
+                    cumulative += count
+                    buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+                result[op] = {
+                    'count': self.counts[op],
+                    'total_seconds': self.totals[op],
+                    'avg_seconds': self.totals[op] / self.counts[op],
+                    'buckets': buckets,
+                }
+            return result
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP card_operation_seconds CardManager 操作耗时",
+            "# TYPE card_operation_seconds histogram",
+        ]
+        for op, stats in self.to_dict().items():
+            for bound, count in stats['buckets'].items():
+                lines.append(f'card_operation_seconds_bucket{{op="{op}",le="{bound}"}} {count}')
+            lines.append(f'card_operation_seconds_sum{{op="{op}"}} {stats["total_seconds"]}')
+            lines.append(f'card_operation_seconds_count{{op="{op}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        """在后台线程启动本地 HTTP 端点: /metrics 为 Prometheus 文本，/metrics.json 为 JSON"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = metrics.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # 不在菜单界面中打印访问日志
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def instrumented(op):
+    """记录被装饰方法的调用次数和耗时，要求实例上有 metrics 属性，为 None 时不记录"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None or not metrics.enabled:
+                return func(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                metrics.observe(op, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def profile_action(action, mode='cprofile', limit=20):
+    """运行 action 并打印分析结果: cprofile-函数耗时, tracemalloc-内存分配"""
+    if mode == 'tracemalloc':
+        tracemalloc.start()
+        try:
+            action()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print(f"\n内存分配 (当前: {current / 1024:.1f} KiB, 峰值: {peak / 1024:.1f} KiB):")
+        for stat in snapshot.statistics('lineno')[:limit]:
+            print(stat)
+    else:
+        profiler = cProfile.Profile()
+        profiler.runcall(action)
+        print("\n函数耗时 (按累计时间排序):")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(limit)
+
+
+class CardSearchIndex:
+    """卡牌名称检索索引：按归一化名称排序的列表 + 字符二元组(n-gram)倒排索引
+
+    名称统一做 casefold 归一化，兼容中英文混排；每次增删卡牌时增量维护。
+    启动恢复时只记录名称，排序和倒排索引由 start_build 在后台线程建立；
+    建立完成前的查询会等待建立结束。
+    """
+
+    def __init__(self, n=2, max_postings=5000, max_candidates=2000):
+        self.n = n
+        # 含有某片段的名称超过该数量时，不再从这个片段枚举候选，只用它给候选计分
+        self.max_postings = max_postings
+        # 只对命中少见片段最多的前若干个候选计算相似度
+        self.max_candidates = max_candidates
+        self.names = set()
+        self.sorted_names = []  # 按归一化名称排序
+        self.pending = []       # 尚未并入 sorted_names 的新名称
+        self.grams = None       # n-gram -> 含有该片段的名称列表，建立前为 None
+        # 后台建立索引时保护以上各项
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(name):
+        return name.strip().casefold()
+
+    def _make_grams(self, text):
+        # 首尾补空格，使开头和结尾的字符也能形成片段
+        padded = f" {text} "
+        if len(padded) <= self.n:
+            return {padded}
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def _index_grams(self, name):
+        for gram in self._make_grams(self.normalize(name)):
+            postings = self.grams.get(gram)
+            if postings is None:
+                self.grams[gram] = [name]
+            else:
+                postings.append(name)
+
+    def _flush_pending(self):
+        if not self.pending:
+            return
+        # 少量新名称逐个插入；批量导入后整体重排
+        if len(self.pending) * 64 < len(self.sorted_names):
+            for name in self.pending:
+                bisect.insort(self.sorted_names, name, key=self.normalize)
+        else:
+            self.sorted_names.extend(self.pending)
+            self.sorted_names.sort(key=self.normalize)
+        self.pending = []
+
+    def _ensure_grams(self):
+        if self.grams is None:
+            self.grams = {}
+            for name in self.names:
+                self._index_grams(name)
+
+    def _build(self):
+        with self.lock:
+            self._flush_pending()
+            self._ensure_grams()
+        # 建立过程产生大量新对象，在后台先做一次垃圾回收，免得由第一次查询触发
+        if self.names:
+            gc.collect()
+
+    def start_build(self):
+        """在后台线程排序名称并建立倒排索引，使第一次查询不必等待全量建立"""
+        threading.Thread(target=self._build, daemon=True).start()
+
+    def add(self, name):
+        with self.lock:
+            if name in self.names:
+                return
+            self.names.add(name)
+            self.pending.append(name)
+            if self.grams is not None:
+                self._index_grams(name)
+
+    def remove(self, name):
+        with self.lock:
+            if name not in self.names:
+                return
+            self.names.discard(name)
+            if self.grams is not None:
+                # 片段可以由名称重新算出，不必为每个名称保存片段集合
+                for gram in self._make_grams(self.normalize(name)):
+                    postings = self.grams[gram]
+                    postings.remove(name)
+                    if not postings:
+                        del self.grams[gram]
+
+            self._flush_pending()
+            i = bisect.bisect_left(self.sorted_names, self.normalize(name), key=self.normalize)
+            while self.sorted_names[i] != name:
+                i += 1
+            del self.sorted_names[i]
+
+    def prefix_search(self, prefix, limit=10):
+        """返回以 prefix 开头的名称，按归一化名称的字典序排列"""
+        with self.lock:
+            return self._prefix_search(prefix, limit)
+
+    def _prefix_search(self, prefix, limit):
+        self._flush_pending()
+        key = self.normalize(prefix)
+        start = bisect.bisect_left(self.sorted_names, key, key=self.normalize)
+        results = []
+        for i in range(start, min(start + limit, len(self.sorted_names))):
+            name = self.sorted_names[i]
+            if not self.normalize(name).startswith(key):
+                break
+            results.append(name)
+        return results
+
+    def fuzzy_search(self, query, limit=10, min_similarity=0.2):
+        """按 n-gram 的 Dice 相似度返回 [(相似度, 名称)]，相似度高的在前
+
+        候选名称只从较少见的片段中枚举，取命中最多的前 max_candidates 个计算相似度；
+        常见片段(超过 max_postings)只用来给候选加分。所有片段都很常见时，
+        从最少见的片段中取前 max_candidates 个名称作为候选。
+        """
+        with self.lock:
+            self._ensure_grams()
+            return self._fuzzy_search(query, limit, min_similarity)
+
+    def _fuzzy_search(self, query, limit, min_similarity):
+        query_grams = self._make_grams(self.normalize(query))
+        postings = sorted(((gram, self.grams[gram]) for gram in query_grams if gram in self.grams),
+                          key=lambda item: len(item[1]))
+        rare = [names for _, names in postings if len(names) <= self.max_postings]
+        common = [gram for gram, names in postings if len(names) > self.max_postings]
+
+        overlap = {}
+        for names in rare:
+            for name in names:
+                overlap[name] = overlap.get(name, 0) + 1
+        if not overlap and common:
+            first = self.grams[common[0]]
+            overlap = dict.fromkeys(itertools.islice(first, self.max_candidates), 0)
+        candidates = overlap.items()
+        if len(overlap) > self.max_candidates:
+            candidates = heapq.nlargest(self.max_candidates, candidates, key=lambda item: item[1])
+
+        scored = []
+        for name, shared in candidates:
+            padded = f" {self.normalize(name)} "
+            # 常见片段的名称列表很长，直接检查候选名称自身是否含有该片段
+            for gram in common:
+                if gram in padded:
+                    shared += 1
+            similarity = 2 * shared / (len(query_grams) + len(self._make_grams(padded[1:-1])))
+            if similarity >= min_similarity:
+                scored.append((similarity, name))
+        scored.sort(key=lambda item: (-item[0], len(item[1]), item[1]))
+        return scored[:limit]
+
+    def search(self, query, limit=10):
+        """综合检索：前缀匹配排在最前(相似度记为1.0)，其余按模糊相似度排序"""
+        results = [(1.0, name) for name in self.prefix_search(query, limit)]
+        if len(results) >= limit:
+            return results
+        seen = {name for _, name in results}
+        for similarity, name in self.fuzzy_search(query, limit):
+            if len(results) >= limit:
+                break
+            if name not in seen:
+                results.append((similarity, name))
+                seen.add(name)
+        return results
+
+
+class CardJournal:
+    """卡牌修改日志：只追加写入，按批次 fsync，定期压缩成快照文件
+
+    每次修改只向日志文件追加一行 JSON；日志行数超过 compact_threshold 时，
+    把当前全部卡牌写成快照(每行一张卡牌的 JSON 数组)并清空日志。
+    启动时先读快照，再按顺序重放日志。
+    """
+
+    def __init__(self, path, batch_size=64, compact_threshold=10000):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.batch_size = batch_size
+        self.compact_threshold = compact_threshold
+        self.pending = 0   # 尚未 fsync 的记录数
+        self.records = 0   # 当前日志中的记录数
+        self.skipped = 0   # 加载时跳过的无法解析的行数
+        self.file = None
+
+    @staticmethod
+    def card_to_row(card):
+        return [card.name, str(card.hp), str(card.attack), str(card.defense), card.element, card.rarity]
+
+    @staticmethod
+    def row_to_card(row):
+        name, hp, attack, defense, element, rarity = row
+        if not all(isinstance(value, str) for value in (name, element, rarity)):
+            raise TypeError("卡牌名称、属性和稀有度必须是字符串")
+        return Card(name, int(hp), int(attack), int(defense), element, rarity)
+
+    def load(self):
+        """读取快照并重放日志，返回卡牌列表
+
+        日志末尾没有换行符的残行会被截掉；其余无法解析的行跳过并保留在文件中，数量记在 skipped 中。
+        """
+        # 名称 -> 卡牌；dict 保持插入顺序，同名覆盖时位置不变，与 self.cards 的行为一致
+        cards = {}
+        self.skipped = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as file:
+                for line in file:
+                    card = self._parse_row(line)
+                    if card is None:
+                        self.skipped += 1
+                    else:
+                        cards[card.name] = card
+
+        self.records = 0
+        if os.path.exists(self.path):
+            valid_size = 0
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        # 只有最后一行可能缺少换行符：崩溃时只写了一半，截掉它以免后续追加接在残行后面
+                        break
+                    valid_size += len(line)
+                    record = self._parse_record(line)
+                    if record is None:
+                        self.skipped += 1
+                        continue
+                    op, value = record
+                    if op == 'put':
+                        cards[value.name] = value
+                    else:
+                        cards.pop(value, None)
+                    self.records += 1
+            if valid_size < os.path.getsize(self.path):
+                os.truncate(self.path, valid_size)
+
+        self.file = open(self.path, 'a', encoding='utf-8')
+        return list(cards.values())
+
+    def _parse_row(self, line):
+        try:
+            return self.row_to_card(json.loads(line.decode('utf-8')))
+        except (UnicodeDecodeError, ValueError, TypeError):
+            return None
+
+    def _parse_record(self, line):
+        """解析一行日志，返回 ('put', 卡牌) 或 ('delete', 名称)，无法解析时返回 None"""
+        try:
+            record = json.loads(line.decode('utf-8'))
+            if record['op'] == 'put':
+                return 'put', self.row_to_card(record['card'])
+            if record['op'] == 'delete' and isinstance(record['name'], str):
+                return 'delete', record['name']
+        except (UnicodeDecodeError, ValueError, TypeError, KeyError):
+            pass
+        return None
+
+    def _append(self, record, bulk=False):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # 每条记录都交给操作系统，进程被结束时不会丢失；fsync 仍按批次进行
+        self.file.flush()
+        self.records += 1
+        self.pending += 1
+        # 批量写入时由调用方在结束后统一 sync
+        if not bulk and self.pending >= self.batch_size:
+            self.sync()
+
+    def record_put(self, card, bulk=False):
+        self._append({'op': 'put', 'card': self.card_to_row(card)}, bulk)
+
+    def record_delete(self, name):
+        self._append({'op': 'delete', 'name': name})
+
+    def sync(self):
+        if self.file is None or not self.pending:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def needs_compaction(self):
+        return self.records >= self.compact_threshold
+
+    def compact(self, cards):
+        """把当前卡牌写成新快照，然后清空日志"""
+        self.sync()
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            for card in cards:
+                file.write(json.dumps(self.card_to_row(card), ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        # 先原子替换快照再清空日志；两步之间崩溃时重放旧日志结果不变
+        os.replace(temp_path, self.snapshot_path)
+
+        self.file.close()
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class TextBattleSink:
+    """把对战事件以文字形式打印到屏幕"""
+
+    def __init__(self, show_rounds=True, metrics=None):
+        self.show_rounds = show_rounds
+        self.names = ('', '')
+        self.metrics = metrics
+
+    @instrumented('battle_output')
+    def emit(self, event):
+        kind = event[0]
+        if kind == 'round':
+            if not self.show_rounds:
+                return
+            _, round_num, damage1, damage2, hp1, hp2 = event
+            name1, name2 = self.names
+            print(f"\n回合 {round_num}:")
+            print(f"{name1} 攻击 {name2}, 造成 {damage1} 点伤害")
+            print(f"{name2} 攻击 {name1}, 造成 {damage2} 点伤害")
+            print(f"当前状态: {name1} HP={hp1}, {name2} HP={hp2}")
+        elif kind == 'start':
+            self.names = (event[1], event[2])
+            print(f"\n对战开始: {event[1]} vs {event[2]}")
+        elif kind == 'result':
+            if event[1] == 0:
+                print("\n对战结果: 平局!")
+            else:
+                print(f"\n对战结果: {self.names[event[1] - 1]} 获胜!")
+
+    def close(self):
+        pass
+
+
+class JsonlBattleSink:
+    """每个事件写一行 JSON，便于用文本工具比较两次对战"""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'w', encoding='utf-8')
+
+    def emit(self, event):
+        self.file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryBattleSink:
+    """紧凑的二进制回放格式：文件头 + 每个事件一条定长(或带长度前缀)记录"""
+
+    MAGIC = b'CBR1'
+    TAGS = {'start': 0, 'round': 1, 'result': 2}
+    # 回合数, 浮点标记位, 伤害1, 伤害2, 血量1, 血量2
+    # 数值统一按 double 存储，标记位记录哪些原本是 float，回放时还原类型
+    ROUND = struct.Struct('<HBdddd')
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'wb')
+        self.file.write(self.MAGIC)
+
+    def emit(self, event):
+        kind = event[0]
+        self.file.write(bytes((self.TAGS[kind],)))
+        if kind == 'round':
+            values = event[2:]
+            flags = 0
+            for i, value in enumerate(values):
+                if isinstance(value, float):
+                    flags |= 1 << i
+            self.file.write(self.ROUND.pack(event[1], flags, *values))
+        elif kind == 'start':
+            for name in event[1:]:
+                data = name.encode('utf-8')
+                self.file.write(struct.pack('<H', len(data)) + data)
+        else:
+            self.file.write(bytes((event[1],)))
+
+    def close(self):
+        self.file.close()
+
+
+def read_battle_log(file_path):
+    """读取 JsonlBattleSink 或 BinaryBattleSink 写出的记录，逐个产出事件"""
+    with open(file_path, 'rb') as file:
+        if file.read(len(BinaryBattleSink.MAGIC)) != BinaryBattleSink.MAGIC:
+            file.seek(0)
+            for line in file:
+                if line.strip():
+                    yield tuple(json.loads(line.decode('utf-8')))
+            return
+
+        tags = {tag: kind for kind, tag in BinaryBattleSink.TAGS.items()}
+        record = BinaryBattleSink.ROUND
+        while True:
+            tag = file.read(1)
+            if not tag:
+                return
+            kind = tags[tag[0]]
+            if kind == 'round':
+                round_num, flags, *values = record.unpack(file.read(record.size))
+                yield ('round', round_num, *(value if flags & (1 << i) else int(value)
+                                             for i, value in enumerate(values)))
+            elif kind == 'start':
+                names = []
+                for _ in range(2):
+                    (length,) = struct.unpack('<H', file.read(2))
+                    names.append(file.read(length).decode('utf-8'))
+                yield ('start', *names)
+            else:
+                yield ('result', file.read(1)[0])
+
+
 class CardManager:
-    def __init__(self):
+    def __init__(self, journal_path=None):
         self.cards = []
+        self.metrics = CardMetrics()
+        self.profile_mode = None  # 非空时用 profile_action 分析下一个菜单操作
+        self.search_index = CardSearchIndex()
+        self.journal = None
+        if journal_path:
+            self.journal = CardJournal(journal_path)
+            self.cards = self.journal.load()
+            for card in self.cards:
+                self.search_index.add(card.name)
+            if self.journal.skipped:
+                print(f"警告: 日志中有 {self.journal.skipped} 行无法解析，已跳过!")
+        self.search_index.start_build()
         self.element_relations = {
             '火': {'克': ['木','冰','兽'], '被克': ['水','岩']},
             '水': {'克': ['火'], '被克': ['电']},
@@ -40,6 +632,28 @@ class CardManager:
             '暗': {'克': ['神秘'], '被克': ['光明']},
         }
 
+    def _record_put(self, card, bulk=False):
+        """bulk 为 True 时不 fsync 也不压缩，调用方结束后需调用 journal.sync() 和 _maybe_compact()"""
+        if self.journal:
+            self.journal.record_put(card, bulk)
+            if not bulk:
+                self._maybe_compact()
+
+    def _record_delete(self, name):
+        if self.journal:
+            self.journal.record_delete(name)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.journal.needs_compaction():
+            self.journal.compact(self.cards)
+
+    def close(self):
+        self.metrics.shutdown()
+        if self.journal:
+            self.journal.close()
+
+    @instrumented('find_card_by_name')
     def find_card_by_name(self, name):
         """通过名称查找卡牌，返回索引和卡牌对象"""
         for i, card in enumerate(self.cards):
@@ -64,14 +678,20 @@ class CardManager:
         element = input("输入属性(火/水/木/电/冰/土/岩/虫/兽/龙/神秘/光明/暗): ")
         rarity = input("输入稀有度: ")
 
-        new_card = Card(name, hp, attack, defense, element, rarity)
+        self.put_card(Card(name, hp, attack, defense, element, rarity))
 
+    @instrumented('create_card')
+    def put_card(self, new_card):
+        """保存卡牌，已有同名卡牌时覆盖"""
+        index, existing_card = self.find_card_by_name(new_card.name)
         if existing_card:
             self.cards[index] = new_card
-            print(f"卡牌 {name} 已更新!")
+            print(f"卡牌 {new_card.name} 已更新!")
         else:
             self.cards.append(new_card)
-            print(f"卡牌 {name} 创建成功!")
+            self.search_index.add(new_card.name)
+            print(f"卡牌 {new_card.name} 创建成功!")
+        self._record_put(new_card)
 
     def modify_card(self):
         print("\n修改卡牌")
@@ -92,18 +712,29 @@ class CardManager:
         new_element = input(f"属性 [{card.element}]: ")
         new_rarity = input(f"稀有度 [{card.rarity}]: ")
 
-        # 更新卡牌属性
+        self.update_card(card, new_hp, new_attack, new_defense, new_element, new_rarity)
+
+    @instrumented('modify_card')
+    def update_card(self, card, new_hp, new_attack, new_defense, new_element, new_rarity):
+        """按输入更新卡牌属性，空字符串表示保持原值"""
         card.hp = int(new_hp) if new_hp else card.hp
         card.attack = int(new_attack) if new_attack else card.attack
         card.defense = int(new_defense) if new_defense else card.defense
         card.element = new_element if new_element else card.element
         card.rarity = new_rarity if new_rarity else card.rarity
         card.score = card.hp + 4 * card.attack + 4 * card.defense
+        self._record_put(card)
 
-        print(f"卡牌 {name} 修改成功!")
+        print(f"卡牌 {card.name} 修改成功!")
 
-    def import_cards(self):
-        file_path = input("输入要导入的txt文件路径: ")
+    def import_cards(self, file_path=None):
+        """导入卡牌；file_path 为空时交互输入"""
+        if file_path is None:
+            file_path = input("输入要导入的txt文件路径: ")
+        self._import_file(file_path)
+
+    @instrumented('import_cards')
+    def _import_file(self, file_path):
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 imported_count = 0
@@ -126,7 +757,14 @@ class CardManager:
                                 updated_count += 1
                             else:
                                 self.cards.append(new_card)
+                                self.search_index.add(name)
                                 imported_count += 1
+                            # 批量导入时不在中途 fsync 和压缩，导入结束后统一处理
+                            self._record_put(new_card, bulk=True)
+
+                if self.journal:
+                    self.journal.sync()
+                    self._maybe_compact()
 
                 print(f"导入完成! 新增卡牌: {imported_count}, 更新卡牌: {updated_count}")
         except FileNotFoundError:
@@ -136,20 +774,33 @@ class CardManager:
 
     def delete_card(self):
         name = input("输入要删除的卡牌名称: ")
+        self._delete_card(name)
+
+    @instrumented('delete_card')
+    def _delete_card(self, name):
         index, card = self.find_card_by_name(name)
         if card:
             del self.cards[index]
+            self.search_index.remove(name)
+            self._record_delete(name)
             print(f"卡牌 {name} 已删除!")
         else:
             print(f"未找到卡牌 {name}!")
 
-    def export_cards(self):
-        file_path = input("输入要导出的txt文件路径: ")
+    def export_cards(self, file_path=None, choice=None):
+        """导出卡牌；file_path/choice 为空时交互输入，choice 同提示中的 y/n/u"""
+        if file_path is None:
+            file_path = input("输入要导出的txt文件路径: ")
+        if choice is None and os.path.exists(file_path):
+            choice = input("文件已存在，是否覆盖? (y-覆盖/n-追加/u-更新同名卡牌): ").lower()
+        self._export_file(file_path, choice)
+
+    @instrumented('export_cards')
+    def _export_file(self, file_path, choice):
         mode = 'w'  # 默认覆盖模式
 
         # 检查文件是否存在
         if os.path.exists(file_path):
-            choice = input("文件已存在，是否覆盖? (y-覆盖/n-追加/u-更新同名卡牌): ").lower()
             if choice == 'n':
                 mode = 'a'
             elif choice == 'u':
@@ -221,13 +872,25 @@ class CardManager:
 
     def search_card(self):
         name = input("输入要查找的卡牌名称: ")
-        index, card = self.find_card_by_name(name)
-        if card:
+        self._search_card(name)
+
+    @instrumented('search_card')
+    def _search_card(self, name):
+        # 先用索引判断是否存在，未命中时不必线性扫描全部卡牌
+        if name in self.search_index.names:
+            index, card = self.find_card_by_name(name)
             print("\n卡牌详细信息:")
             print(card)
-        else:
-            print(f"未找到卡牌 {name}!")
+            return
 
+        print(f"未找到卡牌 {name}!")
+        candidates = self.search_index.search(name)
+        if candidates:
+            print("\n你是不是要找:")
+            for i, (similarity, candidate) in enumerate(candidates, 1):
+                print(f"{i}. {candidate} (相似度: {similarity:.2f})")
+
+    @instrumented('list_all_cards')
     def list_all_cards(self):
         if not self.cards:
             print("当前没有卡牌!")
@@ -244,6 +907,93 @@ class CardManager:
             print(f"{element}属性: 克制 {relations['克'] if relations['克'] else '无'}, "
                   f"被 {relations['被克'] if relations['被克'] else '无'} 克制")
 
+    @instrumented('show_element_matchups')
+    def show_element_matchups(self):
+        if len(self.cards) < 2:
+            print("至少需要两张卡牌才能分析对战!")
+            return
+
+        analytics = ElementAnalytics(self)
+        table = analytics.matchup_table()
+        present = {element for element, _ in table}
+        elements = [e for e in self.element_relations if e in present]
+        elements += sorted(present - set(elements))
+
+        print("\n属性对战胜率 (行: 进攻方, 列: 对手, 单位: %, *: 抽样估算):")
+        print("".join(f"{e:>7}" for e in [''] + elements))
+        for element1 in elements:
+            cells = []
+            for element2 in elements:
+                stats = table.get((element1, element2))
+                if stats:
+                    cells.append(f"{stats['win_rate'] * 100:>6.1f}{'*' if stats['sampled'] else ' '}")
+                else:
+                    cells.append(f"{'-':>6} ")
+            print(f"{element1:>7}" + "".join(cells))
+
+        print("\n属性总体表现:")
+        for element1 in elements:
+            rows = [table[(element1, e)] for e in elements if (element1, e) in table]
+            duels = sum(row['duels'] for row in rows)
+            win_rate = sum(row['win_rate'] * row['duels'] for row in rows) / duels
+            damage = sum(row['avg_damage'] * row['duels'] for row in rows) / duels
+            rounds = sum(row['avg_rounds'] * row['duels'] for row in rows) / duels
+            sampled = [e for e in elements if (element1, e) in table and table[(element1, e)]['sampled']]
+            note = ""
+            if sampled:
+                sample_size = sum(table[(element1, e)]['sample_size'] for e in sampled)
+                note = (f" (与 {'、'.join(sampled)} 的对战为抽样估算, 样本 {sample_size} 种数值组合对, "
+                        f"每个属性最多 {analytics.max_profiles} 种数值组合)")
+            print(f"{element1}属性: 胜率 {win_rate * 100:.1f}%, 平均伤害 {damage:.1f}, 平均回合 {rounds:.1f}{note}")
+
+    def metrics_menu(self):
+        print(f"\n性能统计 (当前: {'开启' if self.metrics.enabled else '关闭'})")
+        print("1. 开启/关闭统计")
+        print("2. 查看统计 (JSON)")
+        print("3. 导出统计到文件")
+        print("4. 启动本地统计端点")
+        print("5. 分析下一个菜单操作")
+        print("6. 清空统计")
+        choice = input("请选择操作: ")
+
+        if choice == '1':
+            self.metrics.enabled = not self.metrics.enabled
+            print(f"性能统计已{'开启' if self.metrics.enabled else '关闭'}!")
+        elif choice == '2':
+            print(self.metrics.to_json())
+        elif choice == '3':
+            file_path = input("输入导出文件路径 (.json 为 JSON, 其他为 Prometheus 文本): ")
+            content = self.metrics.to_json() if file_path.endswith('.json') else self.metrics.to_prometheus()
+            try:
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(content)
+                print(f"统计已导出到 {file_path}!")
+            except Exception as e:
+                print(f"导出失败: {e}")
+        elif choice == '4':
+            if self.metrics.server is not None:
+                print(f"统计端点已在运行: http://127.0.0.1:{self.metrics.server.server_port}/metrics")
+                return
+            port = input("输入端口 [9108]: ")
+            try:
+                server = self.metrics.serve(int(port) if port else 9108)
+                print(f"统计端点已启动: http://127.0.0.1:{server.server_port}/metrics (JSON: /metrics.json)")
+            except (ValueError, OSError) as e:
+                print(f"启动失败: {e}")
+        elif choice == '5':
+            mode = input("分析方式 (c-cProfile函数耗时/t-tracemalloc内存分配): ").lower()
+            if mode in ('c', 't'):
+                self.profile_mode = 'cprofile' if mode == 'c' else 'tracemalloc'
+                print("将在下一个菜单操作结束后打印分析结果")
+            else:
+                print("无效的分析方式!")
+        elif choice == '6':
+            self.metrics.reset()
+            print("统计已清空!")
+        else:
+            print("无效的选择!")
+
+    @instrumented('calculate_attack')
     def calculate_attack(self, attacker, defender):
         # 检查属性克制关系
         attacker_element = attacker.element
@@ -262,6 +1012,65 @@ class CardManager:
         else:
             return attacker.attack
 
+    def battle_events(self, card1, card2):
+        """逐回合产出对战事件，只在被迭代时才计算
+
+        事件为元组:
+            ('start', 名称1, 名称2)
+            ('round', 回合数, 伤害1, 伤害2, 血量1, 血量2)
+            ('result', 胜者)  胜者: 0-平局, 1-第一张卡牌, 2-第二张卡牌
+        """
+        # 创建副本以避免修改原始卡牌数据
+        c1 = Card(card1.name, card1.hp, card1.attack, card1.defense, card1.element, card1.rarity)
+        c2 = Card(card2.name, card2.hp, card2.attack, card2.defense, card2.element, card2.rarity)
+
+        yield ('start', c1.name, c2.name)
+
+        round_num = 1
+        while c1.hp > 0 and c2.hp > 0 and round_num <= 20:  # 最多20回合防止无限循环
+            # 计算实际攻击力（考虑属性克制）
+            attack1 = self.calculate_attack(c1, c2)
+            attack2 = self.calculate_attack(c2, c1)
+
+            # 计算伤害
+            damage1 = max(1, attack1 - c2.defense) if attack1 > c2.defense else 1
+            damage2 = max(1, attack2 - c1.defense) if attack2 > c1.defense else 1
+
+            # 应用伤害
+            c2.hp -= damage1
+            c1.hp -= damage2
+
+            # 确保血量不低于0
+            c1.hp = max(0, c1.hp)
+            c2.hp = max(0, c2.hp)
+
+            yield ('round', round_num, damage1, damage2, c1.hp, c2.hp)
+            round_num += 1
+
+        # 判断胜负
+        if (c1.hp <= 0 and c2.hp <= 0) or c1.hp == c2.hp:
+            yield ('result', 0)
+        elif c1.hp <= 0 or c1.hp < c2.hp:
+            yield ('result', 2)
+        else:
+            yield ('result', 1)
+
+    @instrumented('run_battle')
+    def run_battle(self, card1, card2, sinks=()):
+        """进行一场对战，把事件依次交给 sinks，返回胜者(0/1/2)
+
+        不传 sinks 时不做任何格式化输出，适合批量脚本对战。
+        """
+        event = None
+        if sinks:
+            for event in self.battle_events(card1, card2):
+                for sink in sinks:
+                    sink.emit(event)
+        else:
+            for event in self.battle_events(card1, card2):
+                pass
+        return event[1]
+
     def simulate_battle(self):
         if len(self.cards) < 2:
             print("至少需要两张卡牌才能对战!")
@@ -281,171 +1090,495 @@ class CardManager:
 
             card1 = self.cards[index1]
             card2 = self.cards[index2]
+        except ValueError:
+            print("请输入有效的数字序号!")
+            return
 
-            print(f"\n对战开始: {card1.name} vs {card2.name}")
+        mode = input("输出方式 (回车-逐回合显示/j-记录为JSONL/b-记录为二进制回放/q-只显示结果): ").lower()
+        record_sink = None
+        if mode in ('j', 'b'):
+            file_path = input("输入记录文件路径: ")
+            try:
+                record_sink = JsonlBattleSink(file_path) if mode == 'j' else BinaryBattleSink(file_path)
+            except OSError as e:
+                print(f"无法创建记录文件: {e}")
+                return
+
+        if mode in ('j', 'b', 'q'):
+            sinks = [TextBattleSink(show_rounds=False, metrics=self.metrics)]
+            if record_sink:
+                sinks.append(record_sink)
+        else:
+            sinks = [TextBattleSink(metrics=self.metrics)]
+
+        try:
+            self._simulate_battle(card1, card2, sinks)
+        except OSError as e:
+            print(f"保存对战记录失败: {e}")
+        else:
+            if record_sink:
+                print(f"对战记录已保存到 {file_path}")
+
+    @instrumented('simulate_battle')
+    def _simulate_battle(self, card1, card2, sinks):
+        """进行对战并关闭输出，耗时包含输出和记录文件写入"""
+        try:
+            return self.run_battle(card1, card2, sinks)
+        finally:
+            for sink in sinks:
+                sink.close()
 
-            # 创建副本以避免修改原始卡牌数据
-            c1 = Card(card1.name, card1.hp, card1.attack, card1.defense, card1.element, card1.rarity)
-            c2 = Card(card2.name, card2.hp, card2.attack, card2.defense, card2.element, card2.rarity)
+    def replay_battle(self):
+        file_path = input("输入对战记录文件路径: ")
+        try:
+            sink = TextBattleSink(metrics=self.metrics)
+            for event in read_battle_log(file_path):
+                sink.emit(event)
+        except FileNotFoundError:
+            print("文件未找到!")
+        except Exception as e:
+            print(f"回放失败: {e}")
 
-            round_num = 1
-            while c1.hp > 0 and c2.hp > 0 and round_num <= 20:  # 最多20回合防止无限循环
-                print(f"\n回合 {round_num}:")
+    def battle_royale(self, rarity=None):
+        if not self.cards:
+            print("当前没有卡牌!")
+            return
 
-                # 计算实际攻击力（考虑属性克制）
-                attack1 = self.calculate_attack(c1, c2)
-                attack2 = self.calculate_attack(c2, c1)
+        # 获取所有稀有度列表
+        rarities = list(set(card.rarity for card in self.cards))
+        print("\n可用稀有度:", ", ".join(rarities))
 
-                # 计算伤害
-                damage1 = max(1, attack1 - c2.defense) if attack1 > c2.defense else 1
-                damage2 = max(1, attack2 - c1.defense) if attack2 > c1.defense else 1
+        if rarity is None:
+            rarity = input("请输入要混战的稀有度: ")
+        self._battle_royale(rarity)
 
-                # 应用伤害
-                c2.hp -= damage1
-                c1.hp -= damage2
+    @instrumented('battle_royale')
+    def _battle_royale(self, rarity):
+        # 筛选指定稀有度的卡牌 列表推导式
+        battle_cards = [card for card in self.cards if card.rarity == rarity]
 
-                # 确保血量不低于0
-                c1.hp = max(0, c1.hp)
-                c2.hp = max(0, c2.hp)
+        if not battle_cards:
+            print(f"没有找到稀有度为 {rarity} 的卡牌!")
+            return
 
-                print(f"{c1.name} 攻击 {c2.name}, 造成 {damage1} 点伤害")
-                print(f"{c2.name} 攻击 {c1.name}, 造成 {damage2} 点伤害")
-                print(f"当前状态: {c1.name} HP={c1.hp}, {c2.name} HP={c2.hp}")
+        print(f"\n开始 {rarity} 稀有度混战，共有 {len(battle_cards)} 张卡牌参与:")
+        for card in battle_cards:
+            print(f"- {card.name} (属性: {card.element})")
 
-                round_num += 1
+        # 初始化统计数据结构
+        battle_stats = {}
+        for card in battle_cards:
+            battle_stats[card.name] = {
+                'wins': 0,
+                'losses': 0,
+                'defeated_opponents': [],  # 格式: [对手名称(属性)]
+                'lost_to_opponents': []    # 格式: [对手名称(属性)]
+            }
 
-            # 判断胜负
-            if round_num >= 20:
-                if (c1.hp <= 0 and c2.hp <= 0) or c1.hp == c2.hp:
-                    print("\n对战结果: 平局!")
-                elif c1.hp > c2.hp:
-                    print(f"\n对战结果: {c1.name} 获胜!")
+        # 进行所有可能的1对1对战
+        total_battles = len(battle_cards) * (len(battle_cards) - 1) // 2
+        print(f"\n将进行 {total_battles} 场对战...")
+
+        for i in range(len(battle_cards)):
+            for j in range(i + 1, len(battle_cards)):
+                card1 = battle_cards[i]
+                card2 = battle_cards[j]
+
+                # 混战只需要胜负，不输出每回合信息
+                winner = self.run_battle(card1, card2)
+
+                # 记录对战结果
+                if winner == 0:
+                    # 平局，双方都不计胜负
+                    battle_stats[card1.name]['lost_to_opponents'].append(f"{card2.name}({card2.element})")
+                    battle_stats[card2.name]['lost_to_opponents'].append(f"{card1.name}({card1.element})")
+                elif winner == 2:
+                    # card2 获胜
+                    battle_stats[card2.name]['wins'] += 1
+                    battle_stats[card2.name]['defeated_opponents'].append(f"{card1.name}({card1.element})")
+                    battle_stats[card1.name]['losses'] += 1
+                    battle_stats[card1.name]['lost_to_opponents'].append(f"{card2.name}({card2.element})")
                 else:
-                    print(f"\n对战结果: {c2.name} 获胜!")
-            elif c1.hp <= 0 and c2.hp <= 0:
-                print("\n对战结果: 平局!")
-            elif c1.hp <= 0:
-                print(f"\n对战结果: {c2.name} 获胜!")
+                    # card1 获胜
+                    battle_stats[card1.name]['wins'] += 1
+                    battle_stats[card1.name]['defeated_opponents'].append(f"{card2.name}({card2.element})")
+                    battle_stats[card2.name]['losses'] += 1
+                    battle_stats[card2.name]['lost_to_opponents'].append(f"{card1.name}({card1.element})")
+
+        # 显示混战结果
+        print("\n混战结果统计:")
+        print("=" * 50)
+
+        # 按胜场数排序
+        sorted_stats = sorted(battle_stats.items(), key=lambda x: x[1]['wins'], reverse=True)
+
+        for card_name, stats in sorted_stats:
+            print(f"\n卡牌: {card_name}")
+            print(f"胜场: {stats['wins']} | 败场: {stats['losses']}")
+
+            print("\n战胜的对手:")
+            if stats['defeated_opponents']:
+                for opponent in stats['defeated_opponents']:
+                    print(f"- {opponent}")
             else:
-                print(f"\n对战结果: {c1.name} 获胜!")
+                print("- 无")
+
+            print("\n战败的对手:")
+            if stats['lost_to_opponents']:
+                for opponent in stats['lost_to_opponents']:
+                    print(f"- {opponent}")
+            else:
+                print("- 无")
+
+            print("-" * 50)
+
+    def create_duel_executor(self, cards, workers):
+        """创建对战用的进程池，卡牌列表只在进程启动时传一次，之后按序号分发对战"""
+        return ProcessPoolExecutor(workers, initializer=_init_duel_worker,
+                                   initargs=(self.element_relations, cards))
+
+    def run_pairings(self, cards, pairings, executor=None, batch_size=1000):
+        """批量进行一轮对战，pairings 为卡牌序号对，返回一一对应的胜者列表
+
+        传入 create_duel_executor(cards) 创建的进程池时，按批次分发到多个进程并行计算。
+        """
+        if executor is None or len(pairings) <= batch_size:
+            return [self.run_battle(cards[a], cards[b]) for a, b in pairings]
+        batches = [pairings[i:i + batch_size] for i in range(0, len(pairings), batch_size)]
+        results = []
+        for batch_result in executor.map(_duel_batch, batches):
+            results.extend(batch_result)
+        return results
+
+    def swiss_tournament(self, cards, rounds=None, executor=None):
+        """瑞士轮：每轮让积分相近的卡牌对战，共 ceil(log2 n) 轮
 
+        胜得2分、平局1分、轮空2分；同分时按对手总积分(布赫霍尔茨分)和赋分排名。
+        返回 [(卡牌, 积分, 对手总分)]，排名靠前的在前。
+        """
+        if rounds is None:
+            rounds = max(1, math.ceil(math.log2(len(cards)))) if len(cards) > 1 else 0
+        points = [0] * len(cards)
+        opponents = [[] for _ in cards]
+        had_bye = [False] * len(cards)
+
+        for _ in range(rounds):
+            order = sorted(range(len(cards)), key=lambda i: (-points[i], -cards[i].score, i))
+
+            # 人数为奇数时，积分最低且未轮空过的卡牌轮空
+            if len(order) % 2 == 1:
+                for pos in range(len(order) - 1, -1, -1):
+                    if not had_bye[order[pos]]:
+                        break
+                bye = order.pop(pos)
+                had_bye[bye] = True
+                points[bye] += 2
+
+            # 相邻配对，尽量避开已经交过手的对手(只在附近几名中寻找)
+            pairs = []
+            remaining = deque(order)
+            while remaining:
+                first = remaining.popleft()
+                pick = 0
+                for pos in range(min(len(remaining), 8)):
+                    if remaining[pos] not in opponents[first]:
+                        pick = pos
+                        break
+                second = remaining[pick]
+                del remaining[pick]
+                pairs.append((first, second))
+
+            winners = self.run_pairings(cards, pairs, executor)
+            for (a, b), winner in zip(pairs, winners):
+                opponents[a].append(b)
+                opponents[b].append(a)
+                if winner == 1:
+                    points[a] += 2
+                elif winner == 2:
+                    points[b] += 2
+                else:
+                    points[a] += 1
+                    points[b] += 1
+
+        buchholz = [sum(points[j] for j in opponents[i]) for i in range(len(cards))]
+        ranking = sorted(range(len(cards)), key=lambda i: (-points[i], -buchholz[i], -cards[i].score, i))
+        return [(cards[i], points[i], buchholz[i]) for i in ranking]
+
+    def elimination_tournament(self, cards, executor=None):
+        """单败淘汰赛：按赋分排种子，每轮头尾种子对战，平局时种子靠前者晋级
+
+        共进行 n-1 场对战。返回 [(卡牌, 止步轮次)]，走得越远排名越靠前，
+        同一轮被淘汰的按种子排序；冠军的止步轮次为总轮数+1。
+        """
+        alive = sorted(range(len(cards)), key=lambda i: (-cards[i].score, i))
+        seed = {index: pos for pos, index in enumerate(alive)}
+        reached = {}
+        round_num = 1
+        while len(alive) > 1:
+            # 人数不是2的幂时，种子靠前的卡牌轮空，使下一轮人数变为2的幂
+            size = 1 << (len(alive) - 1).bit_length()
+            byes = size - len(alive)
+            advancing = alive[:byes]
+            playing = alive[byes:]
+            pairs = [(playing[i], playing[-1 - i]) for i in range(len(playing) // 2)]
+
+            winners = self.run_pairings(cards, pairs, executor)
+            for (a, b), winner in zip(pairs, winners):
+                if winner == 2:
+                    advancing.append(b)
+                    reached[a] = round_num
+                else:
+                    advancing.append(a)
+                    reached[b] = round_num
+            alive = sorted(advancing, key=seed.get)
+            round_num += 1
+
+        for index in alive:
+            reached[index] = round_num
+        ranking = sorted(reached, key=lambda i: (-reached[i], seed[i]))
+        return [(cards[i], reached[i]) for i in ranking]
+
+    def tournament(self):
+        if not self.cards:
+            print("当前没有卡牌!")
+            return
+
+        rarities = list(set(card.rarity for card in self.cards))
+        print("\n可用稀有度:", ", ".join(rarities))
+        rarity = input("请输入参赛的稀有度: ")
+        battle_cards = [card for card in self.cards if card.rarity == rarity]
+        if len(battle_cards) < 2:
+            print(f"稀有度为 {rarity} 的卡牌不足两张!")
+            return
+
+        mode = input("赛制 (s-瑞士轮/e-单败淘汰): ").lower()
+        if mode not in ('s', 'e'):
+            print("无效的赛制!")
+            return
+        workers = input("并行进程数 (回车-按CPU核数, 1-不并行): ")
+        try:
+            workers = int(workers) if workers else os.cpu_count() or 1
         except ValueError:
-            print("请输入有效的数字序号!")
+            print("请输入有效的数字!")
+            return
+        self._run_tournament(battle_cards, rarity, mode, workers)
 
-def battle_royale(self):
-    if not self.cards:
-        print("当前没有卡牌!")
-        return
-    
-    # 获取所有稀有度列表
-    rarities = list(set(card.rarity for card in self.cards))
-    print("\n可用稀有度:", ", ".join(rarities))
-    
-    rarity = input("请输入要混战的稀有度: ")
-    
-    # 筛选指定稀有度的卡牌 列表推导式
-    battle_cards = [card for card in self.cards if card.rarity == rarity]
-    
-    if not battle_cards:
-        print(f"没有找到稀有度为 {rarity} 的卡牌!")
-        return
-    
-    print(f"\n开始 {rarity} 稀有度混战，共有 {len(battle_cards)} 张卡牌参与:")
-    for card in battle_cards:
-        print(f"- {card.name} (属性: {card.element})")
-    
-    # 初始化统计数据结构
-    battle_stats = {}
-    for card in battle_cards:
-        battle_stats[card.name] = {
-            'wins': 0,
-            'losses': 0,
-            'defeated_opponents': [],  # 格式: [对手名称(属性)]
-            'lost_to_opponents': []    # 格式: [对手名称(属性)]
-        }
-    
-    # 进行所有可能的1对1对战
-    total_battles = len(battle_cards) * (len(battle_cards) - 1) // 2
-    print(f"\n将进行 {total_battles} 场对战...")
-    
-    for i in range(len(battle_cards)):
-        for j in range(i + 1, len(battle_cards)):
-            card1 = battle_cards[i]
-            card2 = battle_cards[j]
-            
-            # 创建副本以避免修改原始卡牌数据
-            c1 = Card(card1.name, card1.hp, card1.attack, card1.defense, card1.element, card1.rarity)
-            c2 = Card(card2.name, card2.hp, card2.attack, card2.defense, card2.element, card2.rarity)
-            
-            # 对战直到分出胜负或最多20回合
-            round_num = 1
-            while c1.hp > 0 and c2.hp > 0 and round_num <= 20:
-                # 计算实际攻击力（考虑属性克制）
-                attack1 = self.calculate_attack(c1, c2)
-                attack2 = self.calculate_attack(c2, c1)
-                
-                # 计算伤害
-                damage1 = max(1, attack1 - c2.defense) if attack1 > c2.defense else 1
-                damage2 = max(1, attack2 - c1.defense) if attack2 > c1.defense else 1
-                
-                # 应用伤害
-                c2.hp -= damage1
-                c1.hp -= damage2
-                
-                # 确保血量不低于0
-                c1.hp = max(0, c1.hp)
-                c2.hp = max(0, c2.hp)
-                
-                round_num += 1
-            
-            # 记录对战结果
-            if (c1.hp <= 0 and c2.hp <= 0) or (c1.hp == c2.hp):
-                # 平局，双方都不计胜负
-                battle_stats[card1.name]['lost_to_opponents'].append(f"{card2.name}({card2.element})")
-                battle_stats[card2.name]['lost_to_opponents'].append(f"{card1.name}({card1.element})")
-            elif (c1.hp <= 0) or (c1.hp < c2.hp):
-                # card2 获胜
-                battle_stats[card2.name]['wins'] += 1
-                battle_stats[card2.name]['defeated_opponents'].append(f"{card1.name}({card1.element})")
-                battle_stats[card1.name]['losses'] += 1
-                battle_stats[card1.name]['lost_to_opponents'].append(f"{card2.name}({card2.element})")
+    @instrumented('tournament')
+    def _run_tournament(self, battle_cards, rarity, mode, workers, top=20):
+        executor = None
+        if workers > 1:
+            executor = self.create_duel_executor(battle_cards, workers)
+        try:
+            print(f"\n开始 {rarity} 稀有度{'瑞士轮' if mode == 's' else '单败淘汰赛'}，"
+                  f"共有 {len(battle_cards)} 张卡牌参与...")
+            if mode == 's':
+                ranking = self.swiss_tournament(battle_cards, executor=executor)
+                print(f"\n排名 (前{top}名):")
+                for i, (card, points, buchholz) in enumerate(ranking[:top], 1):
+                    print(f"{i}. {card.name} (属性: {card.element}) 积分: {points} 对手总分: {buchholz}")
             else:
-                # card1 获胜
-                battle_stats[card1.name]['wins'] += 1
-                battle_stats[card1.name]['defeated_opponents'].append(f"{card2.name}({card2.element})")
-                battle_stats[card2.name]['losses'] += 1
-                battle_stats[card2.name]['lost_to_opponents'].append(f"{card1.name}({card1.element})")
-    
-    # 显示混战结果
-    print("\n混战结果统计:")
-    print("=" * 50)
-    
-    # 按胜场数排序
-    sorted_stats = sorted(battle_stats.items(), key=lambda x: x[1]['wins'], reverse=True)
-    
-    for card_name, stats in sorted_stats:
-        print(f"\n卡牌: {card_name}")
-        print(f"胜场: {stats['wins']} | 败场: {stats['losses']}")
-        
-        print("\n战胜的对手:")
-        if stats['defeated_opponents']:
-            for opponent in stats['defeated_opponents']:
-                print(f"- {opponent}")
+                ranking = self.elimination_tournament(battle_cards, executor=executor)
+                final_round = ranking[0][1]
+                print(f"\n排名 (前{top}名):")
+                for i, (card, reached) in enumerate(ranking[:top], 1):
+                    stage = "冠军" if reached == final_round else f"第 {reached} 轮淘汰"
+                    print(f"{i}. {card.name} (属性: {card.element}) {stage}")
+        finally:
+            if executor:
+                executor.shutdown()
+
+
+# 进程池中每个工作进程各自持有一个 CardManager 和参赛卡牌列表，只用于计算对战胜负
+_duel_manager = None
+_duel_cards = None
+
+
+def _init_duel_worker(element_relations, cards):
+    global _duel_manager, _duel_cards
+    _duel_manager = CardManager()
+    _duel_manager.element_relations = element_relations
+    _duel_cards = cards
+
+
+def _duel_batch(pairs):
+    return [_duel_manager.run_battle(_duel_cards[a], _duel_cards[b]) for a, b in pairs]
+
+
+class ElementAnalytics:
+    """按属性统计全卡池的对战表现：胜率、平均伤害、平均回合数
+
+    对战结果只取决于双方的属性和(血量, 攻击力, 防御力)，因此先把卡牌按属性和
+    数值组合分组，每组只计算一次并按卡牌数加权，不逐对枚举卡牌。
+    每回合伤害固定，击倒对手所需回合数可以直接算出，不必逐回合模拟。
+    安装了 numpy 时整块向量化计算，否则逐组计算。
+    """
+
+    MAX_ROUNDS = 20
+
+    def __init__(self, manager, max_profiles=400, seed=0):
+        self.manager = manager
+        # 某属性的数值组合超过 max_profiles 种时，按卡牌数加权抽样，None 表示精确计算
+        self.max_profiles = max_profiles
+        self.seed = seed
+
+    def _multiplier2(self, element1, element2):
+        """属性克制倍率的两倍(3/2/1)，与 calculate_attack 一致，保证全程为整数运算"""
+        relations = self.manager.element_relations.get(element1, {})
+        if element2 in relations.get('克', []):
+            return 3
+        if element2 in relations.get('被克', []):
+            return 1
+        return 2
+
+    def group_profiles(self, cards):
+        """返回 {属性: ([(血量, 攻击力, 防御力)], [卡牌数], 是否抽样, 该属性卡牌总数)}"""
+        groups = {}
+        for card in cards:
+            counts = groups.setdefault(card.element, {})
+            profile = (card.hp, card.attack, card.defense)
+            counts[profile] = counts.get(profile, 0) + 1
+
+        rng = random.Random(self.seed)
+        result = {}
+        for element, counts in groups.items():
+            profiles = list(counts)
+            weights = list(counts.values())
+            total = sum(weights)
+            sampled = self.max_profiles is not None and len(profiles) > self.max_profiles
+            if sampled:
+                picked = {}
+                for profile in rng.choices(profiles, weights=weights, k=self.max_profiles):
+                    picked[profile] = picked.get(profile, 0) + 1
+                profiles = list(picked)
+                weights = list(picked.values())
+            result[element] = (profiles, weights, sampled, total)
+        return result
+
+    def _duel_halves(self, hp1, attack1, defense1, hp2, attack2, defense2, mult1, mult2):
+        """计算一场对战，返回 (胜者, 第一张卡造成的伤害*2, 回合数)
+
+        数值全部放大两倍以避免 1.5 倍攻击带来的小数，结果与 run_battle 相同。
+        """
+        if hp1 <= 0 or hp2 <= 0:
+            final1, final2, rounds, dealt = hp1, hp2, 0, 0
         else:
-            print("- 无")
-        
-        print("\n战败的对手:")
-        if stats['lost_to_opponents']:
-            for opponent in stats['lost_to_opponents']:
-                print(f"- {opponent}")
+            damage1 = max(2, attack1 * mult1 - 2 * defense2)
+            damage2 = max(2, attack2 * mult2 - 2 * defense1)
+            rounds = min(-(-2 * hp2 // damage1), -(-2 * hp1 // damage2), self.MAX_ROUNDS)
+            final1 = max(0, 2 * hp1 - rounds * damage2)
+            final2 = max(0, 2 * hp2 - rounds * damage1)
+            dealt = 2 * hp2 - final2
+
+        if (final1 <= 0 and final2 <= 0) or final1 == final2:
+            winner = 0
+        elif final1 <= 0 or final1 < final2:
+            winner = 2
         else:
-            print("- 无")
-        
-        print("-" * 50)
+            winner = 1
+        return winner, dealt, rounds
+
+    def _pair_totals(self, group1, group2, mult1, mult2, same):
+        """返回 [对战场数, 胜场, 平局, 伤害*2 总和, 回合总数]"""
+        sampled = group1[2]
+        if np is not None:
+            return self._pair_totals_vectorized(group1, group2, mult1, mult2, same and not sampled)
+
+        profiles1, weights1 = group1[0], group1[1]
+        profiles2, weights2 = group2[0], group2[1]
+        totals = [0, 0, 0, 0, 0]
+        for i, (hp1, attack1, defense1) in enumerate(profiles1):
+            for j, (hp2, attack2, defense2) in enumerate(profiles2):
+                weight = weights1[i] * weights2[j]
+                if same and not sampled and i == j:
+                    weight -= weights1[i]  # 不统计卡牌和自己对战
+                if not weight:
+                    continue
+                winner, dealt, rounds = self._duel_halves(
+                    hp1, attack1, defense1, hp2, attack2, defense2, mult1, mult2)
+                totals[0] += weight
+                totals[1] += weight if winner == 1 else 0
+                totals[2] += weight if winner == 0 else 0
+                totals[3] += weight * dealt
+                totals[4] += weight * rounds
+        return totals
+
+    def _pair_totals_vectorized(self, group1, group2, mult1, mult2, exclude_self):
+        stats1 = np.array(group1[0], dtype=np.int64).reshape(-1, 3)
+        stats2 = np.array(group2[0], dtype=np.int64).reshape(-1, 3)
+        weights1 = np.array(group1[1], dtype=np.int64)
+        weights2 = np.array(group2[1], dtype=np.int64)
+        hp2, attack2, defense2 = stats2[:, 0][None, :], stats2[:, 1][None, :], stats2[:, 2][None, :]
+
+        totals = [0, 0, 0, 0, 0]
+        chunk = max(1, 1_000_000 // len(stats2))  # 按行分块，限制临时矩阵大小
+        for start in range(0, len(stats1), chunk):
+            block = stats1[start:start + chunk]
+            hp1, attack1, defense1 = block[:, 0][:, None], block[:, 1][:, None], block[:, 2][:, None]
+
+            started = (hp1 > 0) & (hp2 > 0)
+            damage1 = np.maximum(2, attack1 * mult1 - 2 * defense2)
+            damage2 = np.maximum(2, attack2 * mult2 - 2 * defense1)
+            rounds = np.minimum(np.minimum(-(-2 * hp2 // damage1), -(-2 * hp1 // damage2)), self.MAX_ROUNDS)
+            rounds = np.where(started, rounds, 0)
+            final1 = np.where(started, np.maximum(0, 2 * hp1 - rounds * damage2), hp1)
+            final2 = np.where(started, np.maximum(0, 2 * hp2 - rounds * damage1), hp2)
+            dealt = np.where(started, 2 * hp2 - final2, 0)
+
+            draw = ((final1 <= 0) & (final2 <= 0)) | (final1 == final2)
+            win = ~draw & ~((final1 <= 0) | (final1 < final2))
+
+            weight = weights1[start:start + chunk][:, None] * weights2[None, :]
+            if exclude_self:
+                rows = np.arange(len(block))
+                weight[rows, rows + start] -= weights1[start:start + chunk]
+
+            totals[0] += int(weight.sum())
+            totals[1] += int(weight[win].sum())
+            totals[2] += int(weight[draw].sum())
+            totals[3] += int((weight * dealt).sum())
+            totals[4] += int((weight * rounds).sum())
+        return totals
+
+    def matchup_table(self, cards=None):
+        """返回 {(进攻属性, 防守属性): {'duels', 'win_rate', 'draw_rate', 'avg_damage', 'avg_rounds',
+        'sampled', 'sample_size'}}
+
+        duels 为两属性间实际的对战组合数；任一方数值组合超过 max_profiles 时 sampled 为 True，
+        各项比率和平均值按抽样结果估算，sample_size 为实际计算的(进攻方, 对手)数值组合对数。
+        """
+        groups = self.group_profiles(self.manager.cards if cards is None else cards)
+        table = {}
+        for element1, group1 in groups.items():
+            for element2, group2 in groups.items():
+                mult1 = self._multiplier2(element1, element2)
+                mult2 = self._multiplier2(element2, element1)
+                same = element1 == element2
+                duels, wins, draws, dealt, rounds = self._pair_totals(group1, group2, mult1, mult2, same)
+                if not duels:
+                    continue
+                table[(element1, element2)] = {
+                    'duels': group1[3] * group2[3] - (group1[3] if same else 0),
+                    'win_rate': wins / duels,
+                    'draw_rate': draws / duels,
+                    'avg_damage': dealt / duels / 2,
+                    'avg_rounds': rounds / duels,
+                    'sampled': group1[2] or group2[2],
+                    'sample_size': len(group1[0]) * len(group2[0]),
+                }
+        return table
+
 
 def main():
-    manager = CardManager()
+    # 所有修改都会追加到日志文件，下次启动时自动恢复
+    manager = CardManager(journal_path="cards_journal.log")
+
+    try:
+        run_menu(manager)
+    finally:
+        manager.close()
 
+
+def run_menu(manager):
     while True:
         print("\n卡牌管理系统")
         print("1. 创建卡牌")
@@ -458,35 +1591,55 @@ def main():
         print("8. 查看属性克制表")
         print("9. 模拟对战")
         print("10. 模拟混战")
+        print("11. 回放对战记录")
+        print("12. 锦标赛 (瑞士轮/单败淘汰)")
+        print("13. 属性对战分析")
+        print("14. 性能统计")
         print("0. 退出")
 
         choice = input("请选择操作: ")
 
-        if choice == '1':
-            manager.create_card()
-        elif choice == '2':
-            manager.modify_card()
-        elif choice == '3':
-            manager.import_cards()
-        elif choice == '4':
-            manager.delete_card()
-        elif choice == '5':
-            manager.export_cards()
-        elif choice == '6':
-            manager.search_card()
-        elif choice == '7':
-            manager.list_all_cards()
-        elif choice == '8':
-            manager.show_element_table()
-        elif choice == '9':
-            manager.simulate_battle()
-        elif choice == '10':
-            manager.battle_royale()
-        elif choice == '0':
+        if choice == '0':
             print("感谢使用卡牌管理系统!")
             break
+        if manager.profile_mode and choice != '14':
+            mode, manager.profile_mode = manager.profile_mode, None
+            profile_action(lambda: run_choice(manager, choice), mode)
         else:
-            print("无效的选择，请重新输入!")
+            run_choice(manager, choice)
+
+
+def run_choice(manager, choice):
+    if choice == '1':
+        manager.create_card()
+    elif choice == '2':
+        manager.modify_card()
+    elif choice == '3':
+        manager.import_cards()
+    elif choice == '4':
+        manager.delete_card()
+    elif choice == '5':
+        manager.export_cards()
+    elif choice == '6':
+        manager.search_card()
+    elif choice == '7':
+        manager.list_all_cards()
+    elif choice == '8':
+        manager.show_element_table()
+    elif choice == '9':
+        manager.simulate_battle()
+    elif choice == '10':
+        manager.battle_royale()
+    elif choice == '11':
+        manager.replay_battle()
+    elif choice == '12':
+        manager.tournament()
+    elif choice == '13':
+        manager.show_element_matchups()
+    elif choice == '14':
+        manager.metrics_menu()
+    else:
+        print("无效的选择，请重新输入!")
 
 
 if __name__ == "__main__":